@@ -1,12 +1,23 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for
+from flask import Blueprint, abort, current_app, g, make_response, render_template, request, redirect, url_for
 from flask_login import login_required, current_user
 from flask_admin.contrib.sqla import ModelView
-from extensions import db, admin
-from models import User, Booking, Partnership, Payment, TrackingUpdate
-from datetime import datetime, timedelta
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.exc import OperationalError, ProgrammingError, SQLAlchemyError
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from extensions import db, admin, cache
+from models import User, Booking, BookingStatusCount, Partnership, Payment, TrackingUpdate
+from utils import orjsonify
+from datetime import datetime, time, timedelta, timezone
+import hashlib
 
 abp = Blueprint('admin_routes', __name__)
 
+# Accepted ?status= filters for the admin listings
+BOOKING_STATUSES = frozenset({'pending', 'confirmed', 'in_transit', 'delivered', 'cancelled'})
+BOOKING_STATUS_FILTERS = BOOKING_STATUSES | {'all'}
+PARTNERSHIP_STATUS_FILTERS = frozenset({'all', 'pending', 'approved', 'rejected'})
+
 # Admin model views
 class AdminModelView(ModelView):
     def is_accessible(self):
@@ -15,14 +26,154 @@ class AdminModelView(ModelView):
     def inaccessible_callback(self, name, **kwargs):
         return redirect(url_for('users.login'))
 
+# Per-model list settings: narrow column lists and larger server-side pages.
+# Many-to-one columns named in column_list (Booking.user) are joined-loaded
+# by Flask-Admin, so the list renders without a query per row.
+class UserAdmin(AdminModelView):
+    column_list = ('email', 'first_name', 'last_name', 'company_name', 'is_admin', 'is_active', 'created_at')
+    column_sortable_list = ('email', 'created_at')
+    column_default_sort = ('created_at', True)
+    page_size = 50
+    can_view_details = True
+
+class BookingAdmin(AdminModelView):
+    column_list = ('id', 'user', 'tracking_number', 'status', 'payment_status', 'amount', 'created_at')
+    column_sortable_list = ('created_at', 'status')
+    column_default_sort = ('created_at', True)
+    # Keep the edit form from loading every tracking update as select options
+    form_excluded_columns = ('tracking_updates',)
+    page_size = 50
+    can_view_details = True
+
+class PartnershipAdmin(AdminModelView):
+    column_list = ('company_name', 'contact_person', 'email', 'business_type', 'status', 'created_at')
+    column_sortable_list = ('created_at', 'status')
+    column_default_sort = ('created_at', True)
+    page_size = 50
+    can_view_details = True
+
+class PaymentAdmin(AdminModelView):
+    column_list = ('id', 'booking_id', 'amount', 'currency', 'status', 'created_at')
+    column_sortable_list = ('created_at', 'status')
+    column_default_sort = ('created_at', True)
+    page_size = 50
+    can_view_details = True
+
+class TrackingUpdateAdmin(AdminModelView):
+    column_list = ('booking_id', 'status', 'location', 'timestamp')
+    column_sortable_list = ('timestamp',)
+    column_default_sort = ('timestamp', True)
+    page_size = 50
+    can_view_details = True
+
 def setup_admin(app):
     """Setup Flask-Admin"""
     # Add admin views
-    admin.add_view(AdminModelView(User, db.session))
-    admin.add_view(AdminModelView(Booking, db.session))
-    admin.add_view(AdminModelView(Partnership, db.session))
-    admin.add_view(AdminModelView(Payment, db.session))
-    admin.add_view(AdminModelView(TrackingUpdate, db.session))
+    admin.add_view(UserAdmin(User, db.session))
+    admin.add_view(BookingAdmin(Booking, db.session))
+    admin.add_view(PartnershipAdmin(Partnership, db.session))
+    admin.add_view(PaymentAdmin(Payment, db.session))
+    admin.add_view(TrackingUpdateAdmin(TrackingUpdate, db.session))
+
+def _parse_cursor(id_type=str):
+    """Read the (after_ts, after_id) keyset cursor from the query string"""
+    after_ts = request.args.get('after_ts')
+    after_id = request.args.get('after_id', type=id_type)
+    if not after_ts or after_id is None:
+        return None
+    try:
+        return datetime.fromisoformat(after_ts), after_id
+    except ValueError:
+        return None
+
+def _split_page(rows, per_page):
+    """Drop the look-ahead row; return the page and the next page's cursor"""
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, {'after_ts': last.created_at.isoformat(), 'after_id': last.id}
+
+def _page_etag(*parts):
+    """Weak ETag value derived from everything a page's content depends on"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def _bookings_version():
+    """
+    MAX(updated_at) plus the row count over bookings: edits move the former,
+    deletes the latter. The count is the trigger-maintained total where
+    the triggers exist, COUNT(*) elsewhere.
+    """
+    try:
+        # Savepoint, so a missing table does not abort the request's transaction
+        with db.session.begin_nested():
+            latest, total = db.session.execute(db.select(
+                db.func.max(Booking.updated_at),
+                db.select(db.func.sum(BookingStatusCount.cnt)).scalar_subquery()
+            )).one()
+    except (OperationalError, ProgrammingError):
+        # booking_status_counts not created yet (flask init-db not run here)
+        latest, total = db.session.execute(db.select(db.func.max(Booking.updated_at))).scalar(), None
+    if total is None:
+        total = db.session.execute(db.select(db.func.count()).select_from(Booking)).scalar()
+    return latest, total
+
+def _not_modified(etag):
+    """304 that still carries the validator, as RFC 9110 asks"""
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def _approximate_count(model):
+    """Planner row estimate on Postgres, exact COUNT(*) elsewhere"""
+    if db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            db.text("SELECT reltuples::BIGINT FROM pg_class WHERE relname = :table"),
+            {'table': model.__tablename__}
+        ).scalar()
+        # reltuples stays at -1/0 until the table has been analyzed
+        if estimate and estimate > 0:
+            return estimate
+    return model.query.count()
+
+def _today_range():
+    """UTC bounds of today as a half-open range, computed once per request"""
+    if 'today_range' not in g:
+        today_start = datetime.combine(datetime.now(timezone.utc).date(), time.min, tzinfo=timezone.utc)
+        g.today_range = (today_start, today_start + timedelta(days=1))
+    return g.today_range
+
+@cache.memoize(timeout=30)
+def _admin_stats(today_start, tomorrow_start):
+    """Aggregate counts for the admin dashboard"""
+    # Trigger-maintained totals: cost does not grow with the bookings table
+    try:
+        with db.session.begin_nested():
+            counts = dict(db.session.execute(
+                db.select(BookingStatusCount.status, BookingStatusCount.cnt)
+            ).all())
+    except (OperationalError, ProgrammingError):
+        # booking_status_counts not created yet (flask init-db not run here)
+        counts = {}
+    
+    if not counts:
+        # No triggers on this database; one grouped query instead
+        counts = dict(db.session.execute(
+            db.select(Booking.status, db.func.count()).group_by(Booking.status)
+        ).all())
+
+    return {
+        'total_bookings': sum(counts.values()),
+        # Half-open range keeps the predicate sargable on created_at
+        'today_bookings': Booking.query.filter(
+            Booking.created_at >= today_start,
+            Booking.created_at < tomorrow_start
+        ).count(),
+        'pending_bookings': counts.get('pending', 0),
+        'active_bookings': counts.get('confirmed', 0) + counts.get('in_transit', 0),
+        'total_users': _approximate_count(User),
+        'pending_partnerships': Partnership.query.filter_by(status='pending').count()
+    }
 
 @abp.route('/dashboard')
 @login_required
@@ -30,30 +181,32 @@ def dashboard():
     if not current_user.is_admin:
         return redirect(url_for('index'))
     
-    # Statistics
-    today = datetime.utcnow().date()
+    # Statistics (cached; keyed by date so midnight rolls over)
+    stats = _admin_stats(*_today_range())
     
-    stats = {
-        'total_bookings': Booking.query.count(),
-        'today_bookings': Booking.query.filter(
-            db.func.date(Booking.created_at) == today
-        ).count(),
-        'pending_bookings': Booking.query.filter_by(status='pending').count(),
-        'active_bookings': Booking.query.filter(
-            Booking.status.in_(['confirmed', 'in_transit'])
-        ).count(),
-        'total_users': User.query.count(),
-        'pending_partnerships': Partnership.query.filter_by(status='pending').count()
-    }
+    etag = _page_etag(current_user.id, _bookings_version(), stats)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
     
     # Recent bookings
     recent_bookings = Booking.query\
+        .options(selectinload(Booking.user))\
         .order_by(Booking.created_at.desc())\
         .limit(10).all()
     
-    return render_template('admin/dashboard.html',
-                         stats=stats,
-                         recent_bookings=recent_bookings)
+    response = make_response(render_template('admin/dashboard.html',
+                                             stats=stats,
+                                             recent_bookings=recent_bookings))
+    response.set_etag(etag, weak=True)
+    return response
+
+@abp.route('/dashboard/stats.json')
+@login_required
+def dashboard_stats():
+    if not current_user.is_admin:
+        return orjsonify({'error': 'Unauthorized'}, 403)
+    
+    return orjsonify(_admin_stats(*_today_range()))
 
 @abp.route('/bookings/manage')
 @login_required
@@ -62,37 +215,74 @@ def manage_bookings():
         return redirect(url_for('index'))
     
     status_filter = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
+    if status_filter not in BOOKING_STATUS_FILTERS:
+        abort(400)
+    cursor = _parse_cursor()
+    per_page = 20
     
-    query = Booking.query
+    etag = _page_etag(current_user.id, _bookings_version(), status_filter, cursor)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    
+    # lambda_stmt caches the compiled SQL per code path; the filter value,
+    # cursor and limit are extracted from the closures as bound parameters
+    stmt = lambda_stmt(lambda: select(Booking))
     
     if status_filter != 'all':
-        query = query.filter_by(status=status_filter)
+        stmt += lambda s: s.where(Booking.status == status_filter)
     
-    bookings = query.order_by(Booking.created_at.desc())\
-        .paginate(page=page, per_page=20)
+    # Keyset pagination: seek past the last row of the previous page
+    if cursor:
+        after_ts, after_id = cursor
+        stmt += lambda s: s.where(
+            db.tuple_(Booking.created_at, Booking.id) < db.tuple_(after_ts, after_id)
+        )
     
-    return render_template('admin/manage_bookings.html',
-                         bookings=bookings,
-                         status_filter=status_filter)
+    stmt += lambda s: s.order_by(Booking.created_at.desc(), Booking.id.desc())\
+        .limit(per_page + 1)
+    bookings = db.session.scalars(stmt).all()
+    # The extra row only says whether a next page exists; no COUNT(*) needed
+    bookings, next_cursor = _split_page(bookings, per_page)
+    
+    response = make_response(render_template('admin/manage_bookings.html',
+                                             bookings=bookings,
+                                             next_cursor=next_cursor,
+                                             status_filter=status_filter))
+    response.set_etag(etag, weak=True)
+    return response
 
 @abp.route('/booking/<booking_id>/update-status', methods=['POST'])
 @login_required
 def update_booking_status(booking_id):
     if not current_user.is_admin:
-        return jsonify({'error': 'Unauthorized'}), 403
+        return orjsonify({'error': 'Unauthorized'}, 403)
     
     try:
         data = request.json
-        booking = Booking.query.get(booking_id)
+        if not isinstance(data, dict):
+            return orjsonify({'error': 'Invalid request data'}, 400)
+        if data.get('status') not in BOOKING_STATUSES:
+            return orjsonify({'error': 'Invalid status'}, 400)
         
-        if not booking:
-            return jsonify({'error': 'Booking not found'}), 404
+        has_tracking = 'location' in data and 'description' in data
         
-        booking.status = data['status']
+        # Single conditional UPDATE; repeating the current status is a no-op
+        result = db.session.execute(
+            db.update(Booking)
+            .where(Booking.id == booking_id,
+                   Booking.status.is_distinct_from(data['status']))
+            .values(status=data['status'], updated_at=datetime.now(timezone.utc))
+        )
+        
+        if result.rowcount == 0:
+            if not db.session.query(Booking.id).filter_by(id=booking_id).first():
+                return orjsonify({'error': 'Booking not found'}, 404)
+            if not has_tracking:
+                # Already at the requested status, nothing to commit
+                return orjsonify({'success': True})
         
         # Add tracking update
-        if 'location' in data and 'description' in data:
+        if has_tracking:
             update = TrackingUpdate(
                 booking_id=booking_id,
                 location=data['location'],
@@ -101,13 +291,66 @@ def update_booking_status(booking_id):
             )
             db.session.add(update)
         
-        booking.updated_at = datetime.utcnow()
         db.session.commit()
         
-        return jsonify({'success': True})
+        return orjsonify({'success': True})
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 400
+    except (KeyError, TypeError) as e:
+        db.session.rollback()
+        return orjsonify({'error': f'Invalid request data: {e}'}, 400)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Booking status update failed: {str(e)}")
+        return orjsonify({'error': 'Database error'}, 500)
+
+@abp.route('/bookings/bulk-update-status', methods=['POST'])
+@login_required
+def bulk_update_booking_status():
+    if not current_user.is_admin:
+        return orjsonify({'error': 'Unauthorized'}, 403)
+    
+    try:
+        data = request.json
+        if not isinstance(data, dict):
+            return orjsonify({'error': 'Invalid request data'}, 400)
+        items = data['bookings']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return orjsonify({'error': 'bookings must be a list of booking objects'}, 400)
+        if any(item['status'] not in BOOKING_STATUSES for item in items):
+            return orjsonify({'error': 'Invalid status'}, 400)
+        now = datetime.now(timezone.utc)
+        
+        # ORM bulk UPDATE by primary key - one executemany for all rows
+        db.session.execute(db.update(Booking), [
+            {'id': item['id'], 'status': item['status'], 'updated_at': now}
+            for item in items
+        ])
+        
+        tracking_rows = [{
+            'booking_id': item['id'],
+            'location': item['location'],
+            'status': item['status'],
+            'description': item['description'],
+            'timestamp': now
+        } for item in items if 'location' in item and 'description' in item]
+        
+        if tracking_rows:
+            db.session.execute(db.insert(TrackingUpdate), tracking_rows)
+        
+        db.session.commit()
+        
+        return orjsonify({'success': True, 'updated': len(items)})
+        
+    except StaleDataError:
+        db.session.rollback()
+        return orjsonify({'error': 'One or more bookings not found'}, 404)
+    except (KeyError, TypeError) as e:
+        db.session.rollback()
+        return orjsonify({'error': f'Invalid request data: {e}'}, 400)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk booking status update failed: {str(e)}")
+        return orjsonify({'error': 'Database error'}, 500)
 
 @abp.route('/partnerships')
 @login_required
@@ -116,32 +359,45 @@ def partnerships():
         return redirect(url_for('index'))
     
     status_filter = request.args.get('status', 'pending')
-    page = request.args.get('page', 1, type=int)
+    if status_filter not in PARTNERSHIP_STATUS_FILTERS:
+        abort(400)
+    cursor = _parse_cursor(id_type=int)
+    per_page = 20
     
-    query = Partnership.query
+    stmt = lambda_stmt(lambda: select(Partnership))
     
     if status_filter != 'all':
-        query = query.filter_by(status=status_filter)
+        stmt += lambda s: s.where(Partnership.status == status_filter)
+    
+    if cursor:
+        after_ts, after_id = cursor
+        stmt += lambda s: s.where(
+            db.tuple_(Partnership.created_at, Partnership.id) < db.tuple_(after_ts, after_id)
+        )
     
-    partnerships = query.order_by(Partnership.created_at.desc())\
-        .paginate(page=page, per_page=20)
+    stmt += lambda s: s.order_by(Partnership.created_at.desc(), Partnership.id.desc())\
+        .limit(per_page + 1)
+    partnerships = db.session.scalars(stmt).all()
+    partnerships, next_cursor = _split_page(partnerships, per_page)
     
     return render_template('admin/partnerships.html',
                          partnerships=partnerships,
+                         next_cursor=next_cursor,
                          status_filter=status_filter)
 
 @abp.route('/partnership/<int:id>/update', methods=['POST'])
 @login_required
 def update_partnership(id):
     if not current_user.is_admin:
-        return jsonify({'error': 'Unauthorized'}), 403
+        return orjsonify({'error': 'Unauthorized'}, 403)
     
     try:
         data = request.json
-        partnership = Partnership.query.get(id)
+        # Only the status column is written back, so skip the rest of the row
+        partnership = Partnership.query.options(load_only(Partnership.status)).get(id)
         
         if not partnership:
-            return jsonify({'error': 'Not found'}), 404
+            return orjsonify({'error': 'Not found'}, 404)
         
         partnership.status = data['status']
         
@@ -151,7 +407,12 @@ def update_partnership(id):
         partnership.updated_at = datetime.utcnow()
         db.session.commit()
         
-        return jsonify({'success': True})
+        return orjsonify({'success': True})
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 400
\ No newline at end of file
+    except (KeyError, TypeError) as e:
+        db.session.rollback()
+        return orjsonify({'error': f'Invalid request data: {e}'}, 400)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Partnership update failed: {str(e)}")
+        return orjsonify({'error': 'Database error'}, 500)
\ No newline at end of file
@@ -1,80 +1,210 @@
-from flask import Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, session, make_response
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from extensions import db, login_manager, mail, cors, admin
+from extensions import db, login_manager, mail, cors, admin, cache
 from models import User, Booking, Partnership, Address, Payment, TrackingUpdate
 from services.booking_service import BookingService
+from utils import OrjsonProvider, orjsonify
+from config import Config
 import os
 import secrets
 from datetime import datetime, timezone  # Fixed: Added timezone import
-import urllib.parse
-from functools import wraps  # Added for admin_required decorator
+from urllib.parse import quote
+from functools import lru_cache, partial
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
-from geopy.distance import geodesic
-import requests
-import json
 import hashlib  # Moved to top-level
 import random  # Moved to top-level
 from math import radians, sin, cos, sqrt, atan2  # Moved to top-level
 
-from geocoding import geocode_address as geo_geocode, calculate_route as geo_calculate_route
+from geocoding import geocode_address as geo_geocode, calculate_route as geo_calculate_route, \
+    calculate_routes as geo_calculate_routes, needs_network_geocode as geo_needs_network_geocode
+
+# Upper bound on origin/destination pairs per batch route request
+MAX_ROUTE_BATCH = 10
+# Addresses per batch request that may need a Nominatim lookup (neither a known
+# location nor cached); each costs up to two rate-limited calls, so the rest are
+# deferred to a later request instead of holding the process-wide limiter
+MAX_BATCH_NETWORK_GEOCODES = 2
+# Pricing settings are read from the environment once, when Config is imported
+PRICE_PER_KM = getattr(Config, 'PRICE_PER_KM', 200)
+WEIGHT_SURCHARGE_PER_KG = getattr(Config, 'WEIGHT_SURCHARGE_PER_KG', 50)
+HEAVY_SURCHARGE_PER_KG = getattr(Config, 'HEAVY_SURCHARGE_PER_KG', 100)
+SERVICE_MULTIPLIERS = {
+    'express': getattr(Config, 'EXPRESS_MULTIPLIER', 1.5),
+    'standard': getattr(Config, 'STANDARD_MULTIPLIER', 1.0),
+    'economy': getattr(Config, 'ECONOMY_MULTIPLIER', 0.8)
+}
+INSURANCE_RATE = getattr(Config, 'INSURANCE_RATE', 0.02)
+SIGNATURE_FEE = getattr(Config, 'SIGNATURE_FEE', 200)
+MINIMUM_DELIVERY_PRICE = getattr(Config, 'MINIMUM_DELIVERY_PRICE', 500)
+# Form fields that must be non-blank, with the label shown when missing
+REQUIRED_BOOKING_FIELDS = tuple(
+    (field, field.replace('_', ' ').title())
+    for field in ('pickup_address', 'delivery_address', 'package_type', 'weight',
+                  'pickup_contact', 'pickup_phone', 'delivery_contact', 'delivery_phone',
+                  'service_type', 'pickup_date')
+)
+REQUIRED_PARTNERSHIP_FIELDS = tuple(
+    (field, field.replace('_', ' ').title())
+    for field in ('company_name', 'contact_person', 'email', 'phone', 'business_type')
+)
+# Booking form fields read as stripped text: the required ones plus optional notes
+BOOKING_TEXT_FIELDS = tuple(field for field, _ in REQUIRED_BOOKING_FIELDS) + (
+    'dimensions', 'special_instructions'
+)
+# Messages for visitors who are not logged in, keyed by WhatsApp route
+WHATSAPP_DEFAULT_MESSAGES = {
+    'dispatch': "Hello Majesty Xpress Logistics, I'd like to book a dispatch/delivery service.",
+    'track': "Hello Majesty Xpress Logistics, I need help tracking my shipment.",
+    'quote': "Hello Majesty Xpress Logistics, I'd like to get a quote for a delivery service.",
+}
+# Logged-in messages are greeting + quoted first name + per-route suffix; quote()
+# encodes character by character, so the fixed parts can be encoded up front
+WHATSAPP_USER_GREETING = quote("Hello Majesty Xpress, I'm ")
+WHATSAPP_USER_SUFFIXES = {
+    kind: quote(suffix)
+    for kind, suffix in {
+        'dispatch': ". I'd like to book a dispatch service.",
+        'track': ". I need help tracking my shipment.",
+        'quote': ". I'd like to get a delivery quote.",
+    }.items()
+}
+# Dispatch-form message with the static text percent-encoded once; only the
+# user-supplied {fields} are quoted per request (quote() works per character)
+WHATSAPP_DISPATCH_FORM_TEMPLATE = quote("\n".join([
+    "🔄 *DISPATCH BOOKING REQUEST* 🔄",
+    "",
+    "Hello Majesty Xpress Logistics!",
+    "",
+    "I'd like to book a dispatch service:",
+    "",
+    "*Name:* {name}",
+    "*Phone:* {phone}",
+    "*Service Type:* {service_type}",
+    "*Urgency:* {urgency}",
+    "*Pickup Location:* {pickup_location}",
+    "*Delivery Location:* {delivery_location}",
+]), safe='/{}') + "{package_details}" + quote("\n".join([
+    "",
+    "",
+    "Please provide:",
+    "1. A quote for this service",
+    "2. Available time slots",
+    "3. Required documentation",
+    "",
+    "Thank you!",
+]))
+WHATSAPP_PACKAGE_DETAILS_PREFIX = quote("\n*Package Details:* ")
+# Percent-encoding of every UTF-8 byte, as urllib.parse.quote() (safe='/') gives it
+WHATSAPP_QUOTE_TABLE = tuple(quote(bytes([byte])) for byte in range(256))
+# Geocodes of the same address rarely change; keep them for a day
+GEOCODE_CACHE_TIMEOUT = 86400
+
+def quote_whatsapp_text(text):
+    """urllib.parse.quote() for user-entered text, via a lookup per encoded byte"""
+    table = WHATSAPP_QUOTE_TABLE
+    return ''.join([table[byte] for byte in text.encode()])
+
+def _is_exact_geocode(result):
+    """Geocodes worth caching: found, and not an approximate city fallback"""
+    return bool(result) and not result.get('is_approximate')
+
+def _is_exact_route(result):
+    """Routes worth caching: successful, with neither end an approximate fallback"""
+    return bool(result.get('success')) and 'city_fallback' not in (
+        result.get('origin_match_type'), result.get('destination_match_type'))
+
+# Approximate results usually mean Nominatim was unreachable; they are served
+# but not memoized, so an outage does not pin wrong coordinates for a day
+@cache.memoize(timeout=GEOCODE_CACHE_TIMEOUT, response_filter=_is_exact_geocode)
+def _geocode_cached(address):
+    """Geocode lookup shared across requests; misses and approximations are not cached"""
+    return geo_geocode(address)
+
+@cache.memoize(timeout=GEOCODE_CACHE_TIMEOUT, response_filter=_is_exact_route)
+def _calculate_route_cached(origin, destination, mode):
+    """Route lookup shared across requests; only exact successful routes are cached"""
+    return geo_calculate_route(origin, destination, mode)
+
+def _geocode_batch(addresses):
+    """
+    Geocode distinct addresses through the shared cache, allowing at most
+    MAX_BATCH_NETWORK_GEOCODES network lookups; returns (geocoded, deferred)
+    """
+    geocoded, deferred = {}, set()
+    budget = MAX_BATCH_NETWORK_GEOCODES
+    for address in dict.fromkeys(addresses):
+        # Addresses Nominatim already answered, including misses and those
+        # that end in an uncached city fallback, cost nothing on a retry
+        if geo_needs_network_geocode(address) and cache.get(
+                _geocode_cached.make_cache_key(_geocode_cached.uncached, address)) is None:
+            if not budget:
+                deferred.add(address)
+                continue
+            budget -= 1
+        geocoded[address] = _geocode_cached(address)
+    return geocoded, deferred
+
+# Mock travel speed bounds per mode, in km/h
+MOCK_MODE_SPEED_RANGES = {
+    'driving': (30, 60),
+    'walking': (4, 6),
+    'bicycling': (12, 20),
+}
+
+@lru_cache(maxsize=4096)
+def mock_coords(text):
+    """Generate consistent (lat, lng) for a text from its hash; cached per text"""
+    # First 4 digest bytes as an int; same value as int(hexdigest()[:8], 16)
+    # MD5 only as a stable cross-process hash, so skip the FIPS security check
+    hash_int = int.from_bytes(hashlib.md5(text.encode(), usedforsecurity=False).digest()[:4], 'big')
+    
+    # Nigeria bounds: lat 4-14, lng 3-15
+    lat = 4 + (hash_int % 100000) / 100000 * 10
+    lng = 3 + (hash_int // 100000 % 100000) / 100000 * 12
+    
+    return round(lat, 6), round(lng, 6)
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers"""
+    R = 6371  # Earth radius in kilometers
+    
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    
+    return R * c
 
 def generate_mock_route_data(origin, destination, mode='driving'):
     """Generate mock route data for testing - moved outside create_app"""
     try:
-        def mock_coords(text):
-            # Generate consistent coordinates based on text hash
-            hash_obj = hashlib.md5(text.encode())
-            hash_int = int(hash_obj.hexdigest()[:8], 16)
-            
-            # Nigeria bounds: lat 4-14, lng 3-15
-            lat = 4 + (hash_int % 100000) / 100000 * 10
-            lng = 3 + (hash_int // 100000 % 100000) / 100000 * 12
-            
-            return {'lat': round(lat, 6), 'lng': round(lng, 6)}
-        
-        def haversine_distance(lat1, lon1, lat2, lon2):
-            R = 6371  # Earth radius in kilometers
-            
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            
-            return R * c
-        
         # Get mock coordinates
-        origin_coords = mock_coords(origin)
-        dest_coords = mock_coords(destination)
+        origin_lat, origin_lng = mock_coords(origin)
+        dest_lat, dest_lng = mock_coords(destination)
+        origin_coords = {'lat': origin_lat, 'lng': origin_lng}
+        dest_coords = {'lat': dest_lat, 'lng': dest_lng}
         
         # Calculate distance
         distance_km = haversine_distance(
-            origin_coords['lat'], origin_coords['lng'],
-            dest_coords['lat'], dest_coords['lng']
+            origin_lat, origin_lng, dest_lat, dest_lng
         )
         
         # Add realistic randomness
         distance_km = max(1, round(distance_km * random.uniform(0.8, 1.2), 1))
         
-        # Calculate duration based on mode
-        mode_speeds = {
-            'driving': random.uniform(30, 60),  # km/h
-            'walking': random.uniform(4, 6),    # km/h
-            'bicycling': random.uniform(12, 20) # km/h
-        }
-        
-        speed = mode_speeds.get(mode, 40)
+        # Calculate duration based on mode; only the chosen mode's speed is drawn
+        speed_range = MOCK_MODE_SPEED_RANGES.get(mode)
+        speed = random.uniform(*speed_range) if speed_range else 40
         duration_hours = distance_km / speed
         duration_minutes = int(duration_hours * 60)
         
         # Format duration text
-        if duration_hours < 1:
-            duration_text = f"{duration_minutes} min"
-        else:
-            hours = int(duration_hours)
-            minutes = int((duration_hours - hours) * 60)
-            duration_text = f"{hours} hr {minutes} min"
+        hours, minutes = divmod(duration_minutes, 60)
+        duration_text = f"{hours} hr {minutes} min" if hours else f"{minutes} min"
         
         # Calculate base price using defaults if not in app context
         try:
@@ -112,21 +242,30 @@ def generate_mock_route_data(origin, destination, mode='driving'):
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
-    # Import config
-    from config import Config
     app.config.from_object(Config)
     
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
-    admin.init_app(app)
+    if app.config.get('ENABLE_ADMIN', True):
+        admin.init_app(app)
     cors.init_app(app)
+    cache.init_app(app)
 
     # Initialize BookingService
     app.booking_service = BookingService(app)
 
+    # WhatsApp links only depend on config for their prefix, so build it once;
+    # anonymous links have no per-user part and are encoded in full
+    app.whatsapp_url_prefix = f"https://wa.me/{app.config.get('WHATSAPP_NUMBER', '2348012345678')}?text="
+    app.whatsapp_urls = {
+        kind: app.whatsapp_url_prefix + quote(message)
+        for kind, message in WHATSAPP_DEFAULT_MESSAGES.items()
+    }
+
     return app
 
 # Fixed: Only create app once
@@ -140,16 +279,12 @@ login_manager.login_message_category = 'info'
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
-    
-# Fixed: Admin required decorator
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin:
-            flash('You need admin privileges to access this page.', 'error')
-            return redirect(url_for('index'))
-        return f(*args, **kwargs)
-    return decorated_function
+
+# Templates call now() only where they print a date (the footer year), so
+# pages read the clock on demand rather than once per render_template()
+@app.context_processor
+def inject_now():
+    return {'now': partial(datetime.now, timezone.utc)}
     
 # Import and register blueprints
 from users import ubp as users_bp
@@ -158,16 +293,16 @@ from admin import abp as admin_bp  # This will now be 'admin_routes' blueprint
 app.register_blueprint(users_bp, url_prefix='/users')
 app.register_blueprint(admin_bp, url_prefix='/admin')  # URL stays same, just blueprint name changed
 
-# Setup admin views
-from admin import setup_admin
-setup_admin(app)
+# Setup admin views (skipped in processes that never serve /admin)
+if app.config.get('ENABLE_ADMIN', True):
+    from admin import setup_admin
+    setup_admin(app)
 
 # Routes
 @app.route('/')
 def index():
     """Main landing page"""
     return render_template('index.html', 
-                        now=datetime.now(timezone.utc),  # Fixed: timezone-aware
                         whatsapp_number=app.config.get('WHATSAPP_NUMBER', '1234567890'))
 
 @app.route('/services')
@@ -175,21 +310,23 @@ def services():
     """Services page"""
     return render_template('services.html')
 
+def _booking_with_updates(tracking_number):
+    """Booking and its tracking history (newest first) in one joined query"""
+    return db.session.execute(
+        select(Booking)
+        .options(joinedload(Booking.tracking_updates))
+        .where(Booking.tracking_number == tracking_number)
+    ).unique().scalar_one_or_none()
+
 @app.route('/track')
 def track_delivery_page():
     """Tracking page - Fixed: removed login_required for public tracking"""
     tracking_number = request.args.get('tracking_number', '').strip()
     if tracking_number:
         # If tracking number is provided, show results
-        booking = Booking.query.filter_by(tracking_number=tracking_number).first()
+        booking = _booking_with_updates(tracking_number)
         if booking:
-            # Fixed: Check if tracking_updates is a relationship or needs different access
-            try:
-                updates = TrackingUpdate.query.filter_by(booking_id=booking.id)\
-                    .order_by(TrackingUpdate.timestamp.desc()).all()
-            except Exception:
-                updates = []
-            return render_template('tracking.html', booking=booking, updates=updates)
+            return render_template('tracking.html', booking=booking, updates=booking.tracking_updates)
         else:
             return render_template('tracking.html', error='Tracking number not found', tracking_number=tracking_number)
     else:
@@ -226,23 +363,26 @@ def book_delivery():
     if request.method == 'POST':
         try:
             data = request.form
+            get = data.get
+            # Strip each text field once; validation and the inserts reuse it
+            clean = {field: get(field, '').strip() for field in BOOKING_TEXT_FIELDS}
                 
             # Validate required fields
-            required_fields = ['pickup_address', 'delivery_address', 'package_type', 'weight', 
-                            'pickup_contact', 'pickup_phone', 'delivery_contact', 'delivery_phone',
-                            'service_type', 'pickup_date']
-                
-            missing_fields = []
-            for field in required_fields:
-                if not data.get(field, '').strip():
-                    missing_fields.append(field.replace("_", " ").title())
+            missing_fields = [label for field, label in REQUIRED_BOOKING_FIELDS
+                              if not clean[field]]
                 
             if missing_fields:
                 flash(f'Missing required fields: {", ".join(missing_fields)}', 'error')
                 return redirect(url_for('book_delivery'))
                 
-            # Generate booking ID
-            booking_id = f"BOOK-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{secrets.token_hex(4).upper()}"
+            # One clock read per booking: the ID prefix and the pickup date
+            # fallback both use it
+            now = datetime.now(timezone.utc)
+                
+            # Generate booking ID and tracking number from one random draw
+            raw = secrets.token_bytes(12)
+            booking_id = f"BOOK-{now.year}{now.month:02d}{now.day:02d}-{raw[:4].hex().upper()}"
+            tracking_number = f'TRK-{raw[4:].hex().upper()}'
                 
             # Fixed: Safe float conversion
             def safe_float(value, default=0.0):
@@ -256,69 +396,69 @@ def book_delivery():
             # Fixed: Safe date parsing
             def safe_parse_date(date_str, default=None):
                 if not date_str:
-                    return default or datetime.now(timezone.utc)
+                    return default or now
                 try:
-                    # Handle different date formats
-                    if 'T' in date_str:
-                        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    return datetime.strptime(date_str, '%Y-%m-%d')
+                    # Parses both YYYY-MM-DD and full ISO timestamps in C
+                    return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
                 except (ValueError, TypeError):
-                    return default or datetime.now(timezone.utc)
+                    return default or now
                 
-            # Create booking
-            booking = Booking(
+            # Create booking with a single INSERT; nothing reads the row back,
+            # so the ORM unit of work and identity map are skipped
+            db.session.execute(db.insert(Booking).values(
                 id=booking_id,
                 user_id=current_user.id,  # Fixed: Removed unnecessary check since @login_required
-                pickup_address=data['pickup_address'].strip(),
-                delivery_address=data['delivery_address'].strip(),
+                pickup_address=clean['pickup_address'],
+                delivery_address=clean['delivery_address'],
                 package_type=data['package_type'],
-                weight=safe_float(data.get('weight'), 0),
-                dimensions=data.get('dimensions', '').strip() or None,
-                package_value=safe_float(data.get('package_value')) or None,
+                weight=safe_float(get('weight'), 0),
+                dimensions=clean['dimensions'] or None,
+                package_value=safe_float(get('package_value')) or None,
                 insurance_required='insurance_required' in data,
-                special_instructions=data.get('special_instructions', '').strip() or None,
+                special_instructions=clean['special_instructions'] or None,
                 status='pending',
                 payment_status='unpaid',
-                amount=safe_float(data.get('amount'), 0),
+                amount=safe_float(get('amount'), 0),
                 currency='NGN',
-                pickup_date=safe_parse_date(data.get('pickup_date')),
-                tracking_number=f'TRK-{secrets.token_hex(8).upper()}'
-            )
+                pickup_date=safe_parse_date(get('pickup_date')),
+                tracking_number=tracking_number
+            ))
                 
-            db.session.add(booking)
-            db.session.commit()
-                
-            # Save addresses if requested
+            # Save addresses if requested, inside a savepoint: if the database
+            # rejects them, only the savepoint is rolled back and the booking
+            # still goes out in the commit below
             if 'save_addresses' in data:
                 try:
-                    # Save pickup address
-                    pickup_addr_line = data['pickup_address'].split(',')[0].strip() if ',' in data['pickup_address'] else data['pickup_address'].strip()
-                    pickup_address = Address(
-                    user_id=current_user.id,
-                        address_type='pickup',
-                        contact_name=data['pickup_contact'].strip(),
-                        contact_phone=data['pickup_phone'].strip(),
-                        address_line1=pickup_addr_line
-                    )
-                    
-                    # Save delivery address
-                    delivery_addr_line = data['delivery_address'].split(',')[0].strip() if ',' in data['delivery_address'] else data['delivery_address'].strip()
-                    delivery_address = Address(
-                        user_id=current_user.id,
-                        address_type='delivery',
-                        contact_name=data['delivery_contact'].strip(),
-                        contact_phone=data['delivery_phone'].strip(),
-                        address_line1=delivery_addr_line
-                    )
-                    
-                    db.session.add(pickup_address)
-                    db.session.add(delivery_address)
-                    db.session.commit()
+                    with db.session.begin_nested():
+                        # Save pickup address
+                        pickup_addr_line = clean['pickup_address'].split(',')[0].strip()
+                        pickup_address = Address(
+                            user_id=current_user.id,
+                            address_type='pickup',
+                            contact_name=clean['pickup_contact'],
+                            contact_phone=clean['pickup_phone'],
+                            address_line1=pickup_addr_line
+                        )
+                        
+                        # Save delivery address
+                        delivery_addr_line = clean['delivery_address'].split(',')[0].strip()
+                        delivery_address = Address(
+                            user_id=current_user.id,
+                            address_type='delivery',
+                            contact_name=clean['delivery_contact'],
+                            contact_phone=clean['delivery_phone'],
+                            address_line1=delivery_addr_line
+                        )
+                        
+                        db.session.add_all([pickup_address, delivery_address])
+                        db.session.flush()
                 except Exception as addr_error:
                     app.logger.warning(f"Failed to save addresses: {str(addr_error)}")
                     # Don't fail the whole booking for address save failure
             
-            flash(f'Booking created successfully! Your tracking number is: {booking.tracking_number}', 'success')
+            db.session.commit()
+            
+            flash(f'Booking created successfully! Your tracking number is: {tracking_number}', 'success')
             return redirect(url_for('users.dashboard'))
                 
         except Exception as e:
@@ -327,14 +467,8 @@ def book_delivery():
             flash(f'Booking failed: {str(e)}', 'error')
             return redirect(url_for('book_delivery'))
     
-    # GET request - render the form
-    user_addresses = []
-    try:
-        user_addresses = list(Address.query.filter_by(user_id=current_user.id).all())
-    except Exception as e:
-        app.logger.warning(f"Failed to load user addresses: {str(e)}")
-    
-    return render_template('booking.html', user_addresses=user_addresses)
+    # GET request - render the form (it offers no saved addresses, so none are loaded)
+    return render_template('booking.html')
 
 
 @app.route('/api/geocode', methods=['POST'])
@@ -345,13 +479,13 @@ def api_geocode():
         address = data.get('address', '').strip()
         
         if not address:
-            return jsonify({'success': False, 'error': 'Address is required'}), 400
+            return orjsonify({'success': False, 'error': 'Address is required'}, 400)
         
         # Use the improved geocoding
-        result = geo_geocode(address)
+        result = _geocode_cached(address)
         
         if result:
-            return jsonify({
+            return orjsonify({
                 'success': True,
                 'formatted_address': result['formatted_address'],
                 'latitude': result['latitude'],
@@ -360,14 +494,14 @@ def api_geocode():
                 'is_approximate': result.get('is_approximate', False)
             })
         
-        return jsonify({
+        return orjsonify({
             'success': False, 
             'error': 'Could not geocode address. Please try a more specific address.'
-        }), 404
+        }, 404)
         
     except Exception as e:
         current_app.logger.error(f"Geocoding API error: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return orjsonify({'success': False, 'error': str(e)}, 500)
 
 
 @app.route('/api/calculate-route', methods=['POST'])
@@ -380,31 +514,73 @@ def api_calculate_route():
         mode = data.get('mode', 'driving')
         
         if not origin or not destination:
-            return jsonify({'success': False, 'error': 'Both origin and destination are required'}), 400
+            return orjsonify({'success': False, 'error': 'Both origin and destination are required'}, 400)
         
-        # Use improved route calculation
-        result = geo_calculate_route(origin, destination, mode)
+        # Use improved route calculation (copied, since base_price is added below)
+        result = dict(_calculate_route_cached(origin, destination, mode))
         
         if result.get('success'):
             # Add base price calculation
-            from config import Config
-            price_per_km = getattr(Config, 'PRICE_PER_KM', 200)
-            minimum_price = getattr(Config, 'MINIMUM_DELIVERY_PRICE', 500)
-            
-            base_price = result['driving_distance_km'] * price_per_km
-            if base_price < minimum_price:
-                base_price = minimum_price
+            base_price = result['driving_distance_km'] * PRICE_PER_KM
+            if base_price < MINIMUM_DELIVERY_PRICE:
+                base_price = MINIMUM_DELIVERY_PRICE
             
             result['base_price'] = round(base_price, 2)
             
-            return jsonify(result)
+            return orjsonify(result)
         else:
-            return jsonify(result), 400
+            return orjsonify(result, 400)
             
     except Exception as e:
         current_app.logger.error(f"Route calculation API error: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return orjsonify({'success': False, 'error': str(e)}, 500)
     
+@app.route('/api/calculate-route-batch', methods=['POST'])
+@login_required
+def api_calculate_route_batch():
+    """Calculate several routes in one request, geocoding each address once"""
+    try:
+        data = request.get_json(silent=True) or {}
+        origins = data.get('origins')
+        destinations = data.get('destinations')
+        mode = data.get('mode', 'driving')
+        
+        if not isinstance(origins, list) or not isinstance(destinations, list) \
+                or len(origins) != len(destinations):
+            return orjsonify({'success': False, 'error': 'origins and destinations must be lists of equal length'}, 400)
+        if not origins or len(origins) > MAX_ROUTE_BATCH:
+            return orjsonify({'success': False, 'error': f'Between 1 and {MAX_ROUTE_BATCH} routes are allowed per request'}, 400)
+        
+        origins = [str(origin).strip() for origin in origins]
+        destinations = [str(destination).strip() for destination in destinations]
+        if not all(origins) or not all(destinations):
+            return orjsonify({'success': False, 'error': 'Both origin and destination are required'}, 400)
+        
+        geocoded, deferred = _geocode_batch([*origins, *destinations])
+        pairs = list(zip(origins, destinations))
+        ready = [pair for pair in pairs if deferred.isdisjoint(pair)]
+        routes = iter(geo_calculate_routes([origin for origin, _ in ready],
+                                           [destination for _, destination in ready],
+                                           mode, geocoded))
+        
+        results = []
+        for pair in pairs:
+            if not deferred.isdisjoint(pair):
+                # Partial result: the client retries these once the rest are cached
+                results.append({'success': False, 'deferred': True,
+                                'error': 'Not geocoded in this request; retry later'})
+                continue
+            result = next(routes)
+            if result.get('success'):
+                result['base_price'] = round(max(result['driving_distance_km'] * PRICE_PER_KM, MINIMUM_DELIVERY_PRICE), 2)
+            results.append(result)
+        
+        return orjsonify({'success': True, 'complete': not deferred, 'routes': results})
+        
+    except Exception as e:
+        current_app.logger.error(f"Batch route calculation API error: {str(e)}")
+        return orjsonify({'success': False, 'error': str(e)}, 500)
+
 @app.route('/api/calculate-price', methods=['POST'])
 def api_calculate_price():
     """Calculate price based on distance and other factors"""
@@ -414,7 +590,7 @@ def api_calculate_price():
         # Get distance data
         distance_data = data.get('distance_data')
         if not distance_data:
-            return jsonify({'success': False, 'error': 'Distance data is required'}), 400
+            return orjsonify({'success': False, 'error': 'Distance data is required'}, 400)
         
         # Fixed: Safe float conversion with validation
         def safe_float(value, default=0.0):
@@ -432,55 +608,40 @@ def api_calculate_price():
         insurance_required = bool(data.get('insurance_required', False))
         signature_required = bool(data.get('signature_required', False))
         
-        # Calculate price directly using config values
-        from config import Config
-        
         # Start with base price from distance data
         base_price = safe_float(distance_data.get('base_price'), 0)
         total_price = base_price
         
         # Add weight surcharge
-        weight_surcharge = getattr(Config, 'WEIGHT_SURCHARGE_PER_KG', 50)
-        heavy_surcharge = getattr(Config, 'HEAVY_SURCHARGE_PER_KG', 100)
-        
         weight_surcharge_amount = 0
         if weight > 5:
-            weight_surcharge_amount = (weight - 5) * weight_surcharge
+            weight_surcharge_amount = (weight - 5) * WEIGHT_SURCHARGE_PER_KG
             total_price += weight_surcharge_amount
         if weight > 20:
-            heavy_surcharge_amount = (weight - 20) * heavy_surcharge
+            heavy_surcharge_amount = (weight - 20) * HEAVY_SURCHARGE_PER_KG
             total_price += heavy_surcharge_amount
         
         # Apply service type multiplier
-        service_multipliers = {
-            'express': getattr(Config, 'EXPRESS_MULTIPLIER', 1.5),
-            'standard': getattr(Config, 'STANDARD_MULTIPLIER', 1.0),
-            'economy': getattr(Config, 'ECONOMY_MULTIPLIER', 0.8)
-        }
-        
-        multiplier = service_multipliers.get(service_type, 1.0)
+        multiplier = SERVICE_MULTIPLIERS.get(service_type, 1.0)
         total_price *= multiplier
         
         # Add insurance
         insurance_amount = 0
-        insurance_rate = getattr(Config, 'INSURANCE_RATE', 0.02)
         if insurance_required and package_value > 0:
-            insurance_amount = package_value * insurance_rate
+            insurance_amount = package_value * INSURANCE_RATE
             total_price += insurance_amount
         
         # Add signature required fee
-        signature_fee = getattr(Config, 'SIGNATURE_FEE', 200)
         if signature_required:
-            total_price += signature_fee
+            total_price += SIGNATURE_FEE
         
         # Ensure minimum price
-        minimum_price = getattr(Config, 'MINIMUM_DELIVERY_PRICE', 500)
         minimum_adjustment = 0
-        if total_price < minimum_price:
-            minimum_adjustment = minimum_price - total_price
-            total_price = minimum_price
+        if total_price < MINIMUM_DELIVERY_PRICE:
+            minimum_adjustment = MINIMUM_DELIVERY_PRICE - total_price
+            total_price = MINIMUM_DELIVERY_PRICE
         
-        return jsonify({
+        return orjsonify({
             'success': True,
             'final_price': round(total_price, 2),
             'currency': 'NGN',
@@ -493,63 +654,84 @@ def api_calculate_price():
                 'insurance_required': insurance_required,
                 'insurance_amount': round(insurance_amount, 2) if insurance_required else 0,
                 'signature_required': signature_required,
-                'signature_fee': signature_fee if signature_required else 0,
+                'signature_fee': SIGNATURE_FEE if signature_required else 0,
                 'minimum_adjustment': round(minimum_adjustment, 2)
             }
         })
             
     except Exception as e:
         current_app.logger.error(f"Price calculation API error: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return orjsonify({'success': False, 'error': str(e)}, 500)
 
 @app.route('/track-delivery/<tracking_number>', methods=['GET', 'POST'])
 def track_delivery(tracking_number):
     """Track delivery by tracking number - Fixed: Removed duplicate login_required"""
-    booking = Booking.query.filter_by(tracking_number=tracking_number).first()
+    booking = _booking_with_updates(tracking_number)
     
     if not booking:
         return render_template('tracking.html', error='Tracking number not found', 
                              tracking_number=tracking_number)
     
-    # Get tracking updates for this booking
-    try:
-        updates = TrackingUpdate.query.filter_by(booking_id=booking.id)\
-            .order_by(TrackingUpdate.timestamp.desc()).all()
-    except Exception:
-        updates = []
-    
-    return render_template('tracking.html', booking=booking, updates=updates)
+    return render_template('tracking.html', booking=booking, updates=booking.tracking_updates)
 
 @app.route('/api/track/<tracking_number>')  # Fixed: Changed route to avoid conflict
 def api_track(tracking_number):
     """API endpoint for tracking"""
-    booking = Booking.query.filter_by(tracking_number=tracking_number).first()
-    if not booking:
-        return jsonify({'success': False, 'error': 'Not found'}), 404
-    
-    # Get tracking updates
-    try:
-        updates = TrackingUpdate.query.filter_by(booking_id=booking.id)\
-            .order_by(TrackingUpdate.timestamp.desc()).all()
-        updates_data = [{
-            'status': u.status,
-            'location': u.location,
-            'description': u.description,
-            'timestamp': u.timestamp.isoformat() if u.timestamp else None
-        } for u in updates]
-    except Exception:
-        updates_data = []
-    
-    return jsonify({
+    # Change marker for polling clients: booking edits bump updated_at, new
+    # tracking updates move the count and latest timestamp
+    marker = db.session.execute(
+        select(Booking.updated_at, db.func.count(TrackingUpdate.id),
+               db.func.max(TrackingUpdate.timestamp))
+        .outerjoin(TrackingUpdate, TrackingUpdate.booking_id == Booking.id)
+        .where(Booking.tracking_number == tracking_number)
+        .group_by(Booking.id)
+    ).first()
+    if marker is None:
+        return orjsonify({'success': False, 'error': 'Not found'}, 404)
+    
+    etag = hashlib.sha1(repr((tracking_number, *marker)).encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    # Booking columns plus one row per tracking update, in a single query;
+    # plain rows, so no Booking/TrackingUpdate objects are built for a JSON reply
+    rows = db.session.execute(
+        select(
+            Booking.tracking_number, Booking.status, Booking.pickup_address,
+            Booking.delivery_address, Booking.created_at, Booking.estimated_delivery,
+            TrackingUpdate.id.label('update_id'), TrackingUpdate.status.label('update_status'),
+            TrackingUpdate.location, TrackingUpdate.description, TrackingUpdate.timestamp
+        )
+        .outerjoin(TrackingUpdate, TrackingUpdate.booking_id == Booking.id)
+        .where(Booking.tracking_number == tracking_number)
+        .order_by(TrackingUpdate.timestamp.desc())
+    ).all()
+    if not rows:
+        return orjsonify({'success': False, 'error': 'Not found'}, 404)
+    
+    booking = rows[0]
+    updates_data = [{
+        'status': row.update_status,
+        'location': row.location,
+        'description': row.description,
+        'timestamp': row.timestamp
+    } for row in rows if row.update_id is not None]
+    
+    response = orjsonify({
         'success': True,
         'tracking_number': booking.tracking_number,
         'status': booking.status,
         'pickup_address': booking.pickup_address,
         'delivery_address': booking.delivery_address,
-        'created_at': booking.created_at.isoformat() if booking.created_at else None,
-        'estimated_delivery': booking.estimated_delivery.isoformat() if hasattr(booking, 'estimated_delivery') and booking.estimated_delivery else None,
+        # orjson writes datetimes as ISO 8601 itself
+        'created_at': booking.created_at,
+        'estimated_delivery': booking.estimated_delivery,
         'updates': updates_data
     })
+    response.set_etag(etag, weak=True)
+    return response
 
 @app.route('/partnership', methods=['GET', 'POST'])
 def partnership():
@@ -557,13 +739,11 @@ def partnership():
     if request.method == 'POST':
         try:
             data = request.form
+            get = data.get
             
             # Fixed: Validate required fields
-            required_fields = ['company_name', 'contact_person', 'email', 'phone', 'business_type']
-            missing_fields = []
-            for field in required_fields:
-                if not data.get(field, '').strip():
-                    missing_fields.append(field.replace('_', ' ').title())
+            missing_fields = [label for field, label in REQUIRED_PARTNERSHIP_FIELDS
+                              if not get(field, '').strip()]
             
             if missing_fields:
                 flash(f'Missing required fields: {", ".join(missing_fields)}', 'error')
@@ -575,7 +755,7 @@ def partnership():
                 email=data['email'].strip(),
                 phone=data['phone'].strip(),
                 business_type=data['business_type'].strip(),
-                message=data.get('message', '').strip()
+                message=get('message', '').strip()
             )
             
             db.session.add(partnership_entry)
@@ -603,90 +783,62 @@ def partnership():
 @login_required
 def get_address(address_id):
     """API endpoint to get address details"""
-    address = Address.query.get(address_id)
+    # Ownership is part of the lookup, so other users' addresses read as not found;
+    # a plain row of the reply's columns, no Address object is built
+    address = db.session.execute(
+        select(
+            Address.id, Address.contact_name, Address.contact_phone, Address.address_line1,
+            Address.address_line2, Address.city, Address.state, Address.postal_code,
+            Address.country, Address.address_type
+        ).where(Address.id == address_id, Address.user_id == current_user.id)
+    ).first()
     
     if not address:
-        return jsonify({'success': False, 'error': 'Address not found'}), 404
+        return orjsonify({'success': False, 'error': 'Address not found'}, 404)
     
-    # Check if address belongs to current user
-    if address.user_id != current_user.id:
-        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-    
-    return jsonify({
-        'success': True,
-        'address': {
-            'id': address.id,
-            'contact_name': address.contact_name,
-            'contact_phone': address.contact_phone,
-            'address_line1': address.address_line1,
-            'address_line2': getattr(address, 'address_line2', None),
-            'city': getattr(address, 'city', None),
-            'state': getattr(address, 'state', None),
-            'postal_code': getattr(address, 'postal_code', None),
-            'country': getattr(address, 'country', 'Nigeria'),
-            'address_type': address.address_type
-        }
-    })
+    return orjsonify({'success': True, 'address': address._asdict()})
 
 # Routes for WhatsApp integration
+def _whatsapp_redirect(kind):
+    """Redirect to WhatsApp with the message for the given route"""
+    if not current_user.is_authenticated:
+        return redirect(app.whatsapp_urls[kind])
+    
+    # Personalise the message for logged-in users; only the name needs encoding
+    user_name = current_user.first_name or 'User'
+    return redirect(f"{app.whatsapp_url_prefix}{WHATSAPP_USER_GREETING}"
+                    f"{quote_whatsapp_text(user_name)}{WHATSAPP_USER_SUFFIXES[kind]}")
+
 @app.route('/whatsapp-dispatch')
 def whatsapp_dispatch():
     """Generate WhatsApp URL for dispatch booking"""
-    default_message = "Hello Majesty Xpress Logistics, I'd like to book a dispatch/delivery service."
-    
-    # Get user info if logged in
-    if current_user.is_authenticated:
-        user_name = current_user.first_name or current_user.username or 'User'
-        user_message = f"Hello Majesty Xpress, I'm {user_name}. I'd like to book a dispatch service."
-    else:
-        user_message = default_message
-    
-    # URL encode the message
-    encoded_message = urllib.parse.quote(user_message)
-    
-    # Create WhatsApp URL
-    whatsapp_number = app.config.get('WHATSAPP_NUMBER', '2348012345678')
-    whatsapp_url = f"https://wa.me/{whatsapp_number}?text={encoded_message}"
-    
-    # Redirect to WhatsApp
-    return redirect(whatsapp_url)
+    return _whatsapp_redirect('dispatch')
 
 @app.route('/whatsapp-track')
 def whatsapp_track():
     """Generate WhatsApp URL for tracking"""
-    default_message = "Hello Majesty Xpress Logistics, I need help tracking my shipment."
-    
-    if current_user.is_authenticated:
-        user_name = current_user.first_name or current_user.username or 'User'
-        user_message = f"Hello Majesty Xpress, I'm {user_name}. I need help tracking my shipment."
-    else:
-        user_message = default_message
-    
-    encoded_message = urllib.parse.quote(user_message)
-    whatsapp_number = app.config.get('WHATSAPP_NUMBER', '2348012345678')
-    whatsapp_url = f"https://wa.me/{whatsapp_number}?text={encoded_message}"
-    
-    return redirect(whatsapp_url)
+    return _whatsapp_redirect('track')
 
 @app.route('/whatsapp-dispatch-form', methods=['GET', 'POST'])
 def whatsapp_dispatch_form():
     """Form to collect dispatch details before WhatsApp redirect"""
     if request.method == 'POST':
         # Get form data with safe defaults
-        name = request.form.get('name', '').strip()
-        phone = request.form.get('phone', '').strip()
-        service_type = request.form.get('service_type', 'General Dispatch')
-        pickup_location = request.form.get('pickup_location', '').strip()
-        delivery_location = request.form.get('delivery_location', '').strip()
-        package_details = request.form.get('package_details', '').strip()
-        urgency = request.form.get('urgency', 'Standard')
+        get = request.form.get
+        name = get('name', '').strip()
+        phone = get('phone', '').strip()
+        service_type = get('service_type', 'General Dispatch')
+        pickup_location = get('pickup_location', '').strip()
+        delivery_location = get('delivery_location', '').strip()
+        package_details = get('package_details', '').strip()
+        urgency = get('urgency', 'Standard')
         
         # Auto-fill if user is logged in
         if current_user.is_authenticated:
             if not name:
                 first_name = current_user.first_name or ''
                 last_name = current_user.last_name or ''
-                name = f"{first_name} {last_name}".strip() or current_user.username or ''
+                name = f"{first_name} {last_name}".strip()
             if not phone and hasattr(current_user, 'phone') and current_user.phone:
                 phone = current_user.phone
         
@@ -696,40 +848,18 @@ def whatsapp_dispatch_form():
             return redirect(url_for('whatsapp_dispatch_form'))
         
         # Build WhatsApp message
-        message_lines = [
-            "🔄 *DISPATCH BOOKING REQUEST* 🔄",
-            "",
-            "Hello Majesty Xpress Logistics!",
-            "",
-            "I'd like to book a dispatch service:",
-            "",
-            f"*Name:* {name}",
-            f"*Phone:* {phone}",
-            f"*Service Type:* {service_type}",
-            f"*Urgency:* {urgency}",
-            f"*Pickup Location:* {pickup_location}",
-            f"*Delivery Location:* {delivery_location}",
-        ]
-        
-        if package_details:
-            message_lines.append(f"*Package Details:* {package_details}")
-        
-        message_lines.extend([
-            "",
-            "Please provide:",
-            "1. A quote for this service",
-            "2. Available time slots",
-            "3. Required documentation",
-            "",
-            "Thank you!",
-        ])
-        
-        full_message = "\n".join(message_lines)
-        encoded_message = urllib.parse.quote(full_message)
-        
-        # Get WhatsApp number from config
-        whatsapp_number = app.config.get('WHATSAPP_NUMBER', '2347065894127')
-        whatsapp_url = f"https://wa.me/{whatsapp_number}?text={encoded_message}"
+        encode = quote_whatsapp_text
+        encoded_message = WHATSAPP_DISPATCH_FORM_TEMPLATE.format(
+            name=encode(name),
+            phone=encode(phone),
+            service_type=encode(service_type),
+            urgency=encode(urgency),
+            pickup_location=encode(pickup_location),
+            delivery_location=encode(delivery_location),
+            package_details=WHATSAPP_PACKAGE_DETAILS_PREFIX + encode(package_details) if package_details else '',
+        )
+        
+        whatsapp_url = app.whatsapp_url_prefix + encoded_message
         
         # Store in session for tracking (optional)
         session['last_dispatch_name'] = name
@@ -744,47 +874,20 @@ def whatsapp_dispatch_form():
 @app.route('/whatsapp-quote')
 def whatsapp_quote():
     """Get a quick quote via WhatsApp"""
-    default_message = "Hello Majesty Xpress Logistics, I'd like to get a quote for a delivery service."
-    
-    if current_user.is_authenticated:
-        user_name = current_user.first_name or current_user.username or 'User'
-        user_message = f"Hello Majesty Xpress, I'm {user_name}. I'd like to get a delivery quote."
-    else:
-        user_message = default_message
-    
-    encoded_message = urllib.parse.quote(user_message)
-    whatsapp_number = app.config.get('WHATSAPP_NUMBER', '2348012345678')
-    whatsapp_url = f"https://wa.me/{whatsapp_number}?text={encoded_message}"
-    
-    return redirect(whatsapp_url)
+    return _whatsapp_redirect('quote')
 
-# Fixed: Secured admin-seed route
-@app.route('/admin-seed')
-@login_required
-@admin_required
-def admin_seed():
-    """Create admin user - requires existing admin authentication"""
-    if User.query.filter_by(email='admin@example.com').first():
-        return jsonify({'message': 'Admin user already exists'}), 400
-    
-    admin_user = User(
-        email='admin@example.com',
-        first_name='Admin',
-        last_name='User',
-        is_admin=True
-    )
-    admin_user.set_password('admin123')
-    
-    db.session.add(admin_user)
-    db.session.commit()
-    
-    return jsonify({'message': 'Admin user created: admin@example.com'})
+# Tables are created once per deploy instead of on every worker start
+@app.cli.command('init-db')
+def init_db_command():
+    """Create database tables (and the status-count triggers)"""
+    db.create_all()
+    print('Database tables created')
 
 # Fixed: Added CLI command for initial admin creation (more secure)
 @app.cli.command('create-admin')
 def create_admin_command():
     """Create initial admin user via CLI"""
-    if User.query.filter_by(email='admin@example.com').first():
+    if db.session.scalar(select(User.id).filter_by(email='admin@example.com').limit(1)) is not None:
         print('Admin user already exists')
         return
     
@@ -816,13 +919,6 @@ def internal_error(error):
 def forbidden_error(error):
     return render_template('errors/403.html'), 403
 
-# Create tables
-with app.app_context():
-    db.create_all()
-
-
-
-
 
 
 if __name__ == '__main__':
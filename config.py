@@ -18,6 +18,17 @@ class Config:
         'pool_pre_ping': True,
         'pool_recycle': 300,
     }
+    # Size the pool for concurrent request threads; SQLite keeps its own pool
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 20)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        )
+    
+    # Cache - use RedisCache when running more than one worker process
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 300
     
     # Mail configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -37,6 +48,8 @@ class Config:
     
     # Admin
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL')
+    # Set to false for worker processes that never serve Flask-Admin views
+    ENABLE_ADMIN = os.environ.get('ENABLE_ADMIN', 'true').lower() in ['true', '1', 'yes']
     
     # API Keys
     DISTANCE_MATRIX_API_KEY = os.environ.get('DISTANCE_MATRIX_API_KEY')
@@ -79,7 +92,9 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
     WTF_CSRF_ENABLED = False
+    CACHE_TYPE = 'NullCache'
 
 
 # Config selector
@@ -4,10 +4,12 @@ from flask_login import LoginManager
 from flask_mail import Mail
 from flask_cors import CORS
 from flask_admin import Admin
+from flask_caching import Cache
 
 # Initialize extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
 mail = Mail()
 cors = CORS()
-admin = Admin(name='Logistics Admin')
\ No newline at end of file
+admin = Admin(name='Logistics Admin')
+cache = Cache()
\ No newline at end of file
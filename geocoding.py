@@ -4,10 +4,45 @@ Nigerian geocoding utilities with fallback location database
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import threading
 import time
-from typing import Optional, Dict, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from math import radians, sin, cos, sqrt, atan2
+from typing import Optional, Dict, List, Tuple
 import re
 
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+
+# Shared session so repeated Nominatim lookups reuse the keep-alive connection
+# instead of paying a new TCP + TLS handshake per request
+_geo_session = requests.Session()
+_geo_session.headers.update({
+    'User-Agent': 'MajestyXpressLogistics/1.0 (contact@majestyxpress.com)'
+})
+_geo_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+
+# Nominatim lookups in flight, keyed by address, so duplicate callers wait on one result
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+# Finished Nominatim lookups, keyed by case/space-folded address and guarded by
+# _inflight_lock: matches are kept for a day, misses briefly so a failing
+# address is not re-queried (and re-rate-limited) on every request
+NOMINATIM_CACHE_SIZE = 4096
+NOMINATIM_HIT_TTL = 86400
+NOMINATIM_MISS_TTL = 300
+_nominatim_cache: 'OrderedDict[str, Tuple[float, Optional[Dict]]]' = OrderedDict()
+# Nominatim allows one request per second; outbound calls are spaced at least
+# this far apart, measured from the previous call rather than slept up front
+NOMINATIM_MIN_INTERVAL = 1.1
+_nominatim_lock = threading.Lock()
+_nominatim_last_call = 0.0
+
+# Workers for geocoding several addresses at once; their Nominatim calls still
+# queue on the shared rate limit, but network waits overlap
+_geocode_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='geocode')
+
 # Known locations in Abuja and major Nigerian cities
 NIGERIAN_LOCATIONS = {
     # Abuja Locations
@@ -107,20 +142,79 @@ NIGERIAN_LOCATIONS = {
 }
 
 
+def _build_location_matcher(names) -> Tuple[List[Dict[str, int]], List[int], List[Optional[str]]]:
+    """
+    Build an Aho-Corasick automaton over the location names.
+    Returns the goto, failure and longest-name-ending-here tables, indexed by state.
+    """
+    goto: List[Dict[str, int]] = [{}]
+    longest: List[Optional[str]] = [None]
+    for name in names:
+        state = 0
+        for char in name:
+            if char not in goto[state]:
+                goto[state][char] = len(goto)
+                goto.append({})
+                longest.append(None)
+            state = goto[state][char]
+        longest[state] = name
+    
+    # Breadth-first, so a state's failure target is always finished before it
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        parent = queue.popleft()
+        for char, state in goto[parent].items():
+            queue.append(state)
+            if parent:
+                target = fail[parent]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[state] = goto[target].get(char, 0)
+            inherited = longest[fail[state]]
+            if inherited and (not longest[state] or len(inherited) > len(longest[state])):
+                longest[state] = inherited
+    
+    return goto, fail, longest
+
+
+# One automaton over every known name, so an address is scanned once
+_LOCATION_GOTO, _LOCATION_FAIL, _LOCATION_LONGEST = _build_location_matcher(NIGERIAN_LOCATIONS)
+
+
+def _longest_known_location(text: str) -> Optional[str]:
+    """
+    Return the longest known location name contained in text, in one pass.
+    """
+    goto, fail, longest = _LOCATION_GOTO, _LOCATION_FAIL, _LOCATION_LONGEST
+    state = 0
+    match = None
+    for char in text:
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        found = longest[state]
+        if found and (match is None or len(found) > len(match)):
+            match = found
+    return match
+
+
+# Common address words and punctuation, removed wherever they occur (not only
+# as whole words). Longest first, so 'extension' beats 'ext' and 'estate' beats
+# 'state'; 'bus stop' also matches when punctuation joins the two words.
+_REMOVE_WORDS_RE = re.compile('|'.join(sorted(
+    ['street', 'road', 'avenue', 'close', 'crescent', 'drive',
+     'estate', 'layout', 'phase', 'extension', 'ext', 'nigeria',
+     'fct', 'state', r'[,.\-]', 'near', 'opposite', 'beside',
+     'behind', 'after', 'before', 'junction', r'bus[ ,.\-]stop'],
+    key=len, reverse=True
+)))
+
+
 def normalize_address(address: str) -> str:
     """Normalize address for matching"""
-    # Convert to lowercase
-    normalized = address.lower().strip()
-    # Remove common words
-    remove_words = ['street', 'road', 'avenue', 'close', 'crescent', 'drive', 
-                   'estate', 'layout', 'phase', 'extension', 'ext', 'nigeria',
-                   'fct', 'state', ',', '.', '-', 'near', 'opposite', 'beside',
-                   'behind', 'after', 'before', 'junction', 'bus stop']
-    for word in remove_words:
-        normalized = normalized.replace(word, ' ')
-    # Remove extra spaces
-    normalized = ' '.join(normalized.split())
-    return normalized
+    # Lowercase, drop common words in one pass, then collapse spaces
+    return ' '.join(_REMOVE_WORDS_RE.sub(' ', address.lower()).split())
 
 
 def find_known_location(address: str) -> Optional[Dict]:
@@ -130,17 +224,18 @@ def find_known_location(address: str) -> Optional[Dict]:
     """
     normalized = normalize_address(address)
     
-    # Try to find exact matches first
-    for location_name, coords in NIGERIAN_LOCATIONS.items():
-        if location_name in normalized:
-            return {
-                'latitude': coords['lat'],
-                'longitude': coords['lng'],
-                'formatted_address': f"{location_name.title()}, {coords['city']}, Nigeria",
-                'city': coords['city'],
-                'match_type': 'known_location',
-                'matched_term': location_name
-            }
+    # Longest name wins, so 'wuse 2' is preferred over 'wuse'
+    location_name = _longest_known_location(normalized)
+    if location_name:
+        coords = NIGERIAN_LOCATIONS[location_name]
+        return {
+            'latitude': coords['lat'],
+            'longitude': coords['lng'],
+            'formatted_address': f"{location_name.title()}, {coords['city']}, Nigeria",
+            'city': coords['city'],
+            'match_type': 'known_location',
+            'matched_term': location_name
+        }
     
     return None
 
@@ -149,13 +244,80 @@ def geocode_with_nominatim(address: str, timeout: int = 10) -> Optional[Dict]:
     """
     Geocode using OpenStreetMap Nominatim API.
     Free, no API key required.
+    Concurrent lookups of the same address share one request,
+    and recent answers are served from memory.
     """
-    try:
-        # Rate limiting - Nominatim requires max 1 request per second
-        time.sleep(1.1)
-        
-        nominatim_url = "https://nominatim.openstreetmap.org/search"
+    key = ' '.join(address.lower().split())
+    with _inflight_lock:
+        cached = _nominatim_cache.get(key)
+        if cached is not None:
+            expires_at, result = cached
+            if expires_at > time.monotonic():
+                _nominatim_cache.move_to_end(key)
+                return result
+            del _nominatim_cache[key]
         
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = _inflight[key] = Future()
+    
+    if not is_leader:
+        return future.result()
+    
+    try:
+        result = _nominatim_lookup(address, timeout)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        ttl = NOMINATIM_HIT_TTL if result else NOMINATIM_MISS_TTL
+        with _inflight_lock:
+            _nominatim_cache[key] = (time.monotonic() + ttl, result)
+            if len(_nominatim_cache) > NOMINATIM_CACHE_SIZE:
+                _nominatim_cache.popitem(last=False)
+        return result
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def needs_network_geocode(address: str) -> bool:
+    """
+    Whether geocode_address() would have to call Nominatim for this address,
+    i.e. it is not a known location and has no unexpired answer (hit or miss)
+    in the Nominatim cache.
+    """
+    if not address or len(address.strip()) < 3:
+        return False
+    address = address.strip()
+    if find_known_location(address):
+        return False
+    key = ' '.join(address.lower().split())
+    with _inflight_lock:
+        cached = _nominatim_cache.get(key)
+        return cached is None or cached[0] <= time.monotonic()
+
+
+def _wait_for_nominatim_slot() -> None:
+    """
+    Block until the next Nominatim request is allowed, then claim the slot.
+    Sleeps only for what is left of the interval since the last request.
+    """
+    global _nominatim_last_call
+    with _nominatim_lock:
+        wait = NOMINATIM_MIN_INTERVAL - (time.monotonic() - _nominatim_last_call)
+        if wait > 0:
+            time.sleep(wait)
+        _nominatim_last_call = time.monotonic()
+
+
+def _nominatim_lookup(address: str, timeout: int) -> Optional[Dict]:
+    """
+    Query Nominatim with the full address, then with a simplified one.
+    """
+    try:
         # Try with full address first
         params = {
             'q': address,
@@ -165,11 +327,8 @@ def geocode_with_nominatim(address: str, timeout: int = 10) -> Optional[Dict]:
             'countrycodes': 'ng'  # Limit to Nigeria
         }
         
-        headers = {
-            'User-Agent': 'MajestyXpressLogistics/1.0 (contact@majestyxpress.com)'
-        }
-        
-        response = requests.get(nominatim_url, params=params, headers=headers, timeout=timeout)
+        _wait_for_nominatim_slot()
+        response = _geo_session.get(NOMINATIM_URL, params=params, timeout=timeout)
         
         if response.status_code == 200:
             results = response.json()
@@ -187,7 +346,8 @@ def geocode_with_nominatim(address: str, timeout: int = 10) -> Optional[Dict]:
         simplified = normalize_address(address)
         params['q'] = f"{simplified}, Nigeria"
         
-        response = requests.get(nominatim_url, params=params, headers=headers, timeout=timeout)
+        _wait_for_nominatim_slot()
+        response = _geo_session.get(NOMINATIM_URL, params=params, timeout=timeout)
         
         if response.status_code == 200:
             results = response.json()
@@ -232,32 +392,48 @@ def geocode_address(address: str) -> Optional[Dict]:
         print(f"Found via Nominatim: {nominatim_result['formatted_address'][:50]}...")
         return nominatim_result
     
-    # Final fallback - try to extract city name
-    for city_name, coords in NIGERIAN_LOCATIONS.items():
-        if city_name in address.lower():
-            return {
-                'latitude': coords['lat'],
-                'longitude': coords['lng'],
-                'formatted_address': f"{address} (approximate: {city_name.title()})",
-                'match_type': 'city_fallback',
-                'is_approximate': True
-            }
+    # Final fallback - try to extract city name from the un-normalized address,
+    # where names like 'airport road' survive
+    city_name = _longest_known_location(address.lower())
+    if city_name:
+        coords = NIGERIAN_LOCATIONS[city_name]
+        return {
+            'latitude': coords['lat'],
+            'longitude': coords['lng'],
+            'formatted_address': f"{address} (approximate: {city_name.title()})",
+            'match_type': 'city_fallback',
+            'is_approximate': True
+        }
     
     return None
 
 
+def geocode_addresses(addresses: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Geocode several addresses concurrently, once per distinct address.
+    The first runs in the calling thread, the rest on the geocoding pool.
+    """
+    distinct = list(dict.fromkeys(addresses))
+    if not distinct:
+        return {}
+    
+    futures = [_geocode_pool.submit(geocode_address, address) for address in distinct[1:]]
+    geocoded = {distinct[0]: geocode_address(distinct[0])}
+    geocoded.update(zip(distinct[1:], (future.result() for future in futures)))
+    return geocoded
+
+
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate distance between two points using Haversine formula.
     Returns distance in kilometers.
     """
-    from math import radians, sin, cos, sqrt, atan2
-    
     R = 6371  # Earth's radius in kilometers
     
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    lat1 = radians(lat1)
+    lat2 = radians(lat2)
     dlat = lat2 - lat1
-    dlon = lon2 - lon1
+    dlon = radians(lon2) - radians(lon1)
     
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * atan2(sqrt(a), sqrt(1-a))
@@ -269,10 +445,33 @@ def calculate_route(origin: str, destination: str, mode: str = 'driving') -> Opt
     """
     Calculate route between two addresses.
     """
-    # Geocode both addresses
-    origin_geo = geocode_address(origin)
-    dest_geo = geocode_address(destination)
+    # Geocode both addresses concurrently
+    geocoded = geocode_addresses([origin, destination])
+    
+    return _route_from_geocodes(origin, destination, geocoded[origin], geocoded[destination], mode)
+
+
+def calculate_routes(origins: List[str], destinations: List[str], mode: str = 'driving',
+                     geocoded: Optional[Dict[str, Optional[Dict]]] = None) -> List[Dict]:
+    """
+    Calculate routes for paired origins and destinations.
+    Each distinct address is geocoded once for the whole batch,
+    unless the caller passes the geocodes in.
+    """
+    if geocoded is None:
+        geocoded = geocode_addresses([*origins, *destinations])
     
+    return [
+        _route_from_geocodes(origin, destination, geocoded[origin], geocoded[destination], mode)
+        for origin, destination in zip(origins, destinations)
+    ]
+
+
+def _route_from_geocodes(origin: str, destination: str, origin_geo: Optional[Dict],
+                         dest_geo: Optional[Dict], mode: str) -> Dict:
+    """
+    Build the route result for two already geocoded addresses.
+    """
     if not origin_geo:
         return {'success': False, 'error': f'Could not locate origin: {origin}'}
     
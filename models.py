@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from flask_login import UserMixin
+from sqlalchemy import DDL, event
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db  # Only import db
 
@@ -33,9 +34,13 @@ class User(UserMixin, db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        db.Index('ix_bookings_created_at_id', 'created_at', 'id'),
+        db.Index('ix_bookings_status_created_at', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(20), primary_key=True)  # Format: BOOK-YYYYMMDD-XXXX
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     
     # Simplified for now - remove foreign keys to avoid complexity
     pickup_address = db.Column(db.String(500))
@@ -52,7 +57,7 @@ class Booking(db.Model):
     # Status Tracking
     status = db.Column(db.String(50), default='pending')  # pending, confirmed, in_transit, delivered, cancelled
     payment_status = db.Column(db.String(50), default='unpaid')  # unpaid, partial, paid
-    tracking_number = db.Column(db.String(100), unique=True)
+    tracking_number = db.Column(db.String(100), unique=True, index=True)
     
     # Payment
     amount = db.Column(db.Float)
@@ -65,21 +70,109 @@ class Booking(db.Model):
     delivery_date = db.Column(db.DateTime(timezone=True))
     estimated_delivery = db.Column(db.DateTime(timezone=True))
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
     
     # Relationships
     payments = db.relationship('Payment', backref='booking', lazy='dynamic')
-    tracking_updates = db.relationship('TrackingUpdate', backref='booking', lazy='dynamic')
+    # Newest first; never lazy-loaded, so every view that shows the history
+    # must ask for it up front with selectinload()/joinedload()
+    tracking_updates = db.relationship('TrackingUpdate', backref='booking',
+                                       order_by='TrackingUpdate.timestamp.desc()',
+                                       lazy='raise')
     
     def generate_tracking_number(self):
         import secrets
         self.tracking_number = f'TRK-{secrets.token_hex(8).upper()}'
 
+class BookingStatusCount(db.Model):
+    """Per-status booking totals kept current by database triggers"""
+    __tablename__ = 'booking_status_counts'
+    
+    status = db.Column(db.String(50), primary_key=True)
+    cnt = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Triggers are created together with the counts table (fresh databases and
+# existing ones alike) and the table is seeded from the current bookings.
+# Dialects without triggers here leave it empty and the dashboard falls
+# back to a GROUP BY.
+BookingStatusCount.__table__.add_is_dependent_on(Booking.__table__)
+
+_SEED_BOOKING_STATUS_COUNTS = DDL("""
+INSERT INTO booking_status_counts (status, cnt)
+SELECT status, COUNT(*) FROM bookings WHERE status IS NOT NULL GROUP BY status
+""")
+
+_SQLITE_BOOKING_STATUS_TRIGGERS = [
+    """
+CREATE TRIGGER booking_status_counts_ins AFTER INSERT ON bookings
+WHEN NEW.status IS NOT NULL
+BEGIN
+    INSERT INTO booking_status_counts (status, cnt) VALUES (NEW.status, 1)
+    ON CONFLICT (status) DO UPDATE SET cnt = cnt + 1;
+END
+""",
+    """
+CREATE TRIGGER booking_status_counts_del AFTER DELETE ON bookings
+WHEN OLD.status IS NOT NULL
+BEGIN
+    UPDATE booking_status_counts SET cnt = cnt - 1 WHERE status = OLD.status;
+END
+""",
+    """
+CREATE TRIGGER booking_status_counts_upd AFTER UPDATE OF status ON bookings
+WHEN OLD.status IS NOT NEW.status
+BEGIN
+    UPDATE booking_status_counts SET cnt = cnt - 1 WHERE status = OLD.status;
+    INSERT INTO booking_status_counts (status, cnt)
+    SELECT NEW.status, 1 WHERE NEW.status IS NOT NULL
+    ON CONFLICT (status) DO UPDATE SET cnt = cnt + 1;
+END
+""",
+]
+
+_POSTGRES_BOOKING_STATUS_TRIGGERS = [
+    """
+CREATE OR REPLACE FUNCTION booking_status_counts_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.status IS NOT NULL THEN
+            UPDATE booking_status_counts SET cnt = cnt - 1 WHERE status = OLD.status;
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.status IS NOT NULL THEN
+            INSERT INTO booking_status_counts (status, cnt) VALUES (NEW.status, 1)
+            ON CONFLICT (status) DO UPDATE SET cnt = booking_status_counts.cnt + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER booking_status_counts_ins_del AFTER INSERT OR DELETE ON bookings
+FOR EACH ROW EXECUTE FUNCTION booking_status_counts_sync()
+""",
+    """
+CREATE TRIGGER booking_status_counts_upd AFTER UPDATE OF status ON bookings
+FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION booking_status_counts_sync()
+""",
+]
+
+for _dialect, _statements in (('sqlite', _SQLITE_BOOKING_STATUS_TRIGGERS),
+                              ('postgresql', _POSTGRES_BOOKING_STATUS_TRIGGERS)):
+    event.listen(BookingStatusCount.__table__, 'after_create',
+                 _SEED_BOOKING_STATUS_COUNTS.execute_if(dialect=_dialect))
+    for _statement in _statements:
+        event.listen(BookingStatusCount.__table__, 'after_create',
+                     DDL(_statement).execute_if(dialect=_dialect))
+
 class Address(db.Model):
     __tablename__ = 'addresses'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     address_type = db.Column(db.String(20))  # pickup, delivery, billing
     contact_name = db.Column(db.String(128))
     contact_phone = db.Column(db.String(20))
@@ -110,7 +203,7 @@ class TrackingUpdate(db.Model):
     __tablename__ = 'tracking_updates'
     
     id = db.Column(db.Integer, primary_key=True)
-    booking_id = db.Column(db.String(20), db.ForeignKey('bookings.id'))
+    booking_id = db.Column(db.String(20), db.ForeignKey('bookings.id'), index=True)
     location = db.Column(db.String(255))
     status = db.Column(db.String(100))
     description = db.Column(db.Text)
@@ -120,6 +213,10 @@ class TrackingUpdate(db.Model):
 
 class Partnership(db.Model):
     __tablename__ = 'partnerships'
+    __table_args__ = (
+        db.Index('ix_partnerships_created_at_id', 'created_at', 'id'),
+        db.Index('ix_partnerships_status_created_at', 'status', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     company_name = db.Column(db.String(255))
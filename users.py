@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy.orm import selectinload
 from extensions import db
-from models import User, Booking, Address, TrackingUpdate
+from models import User, Booking, Address
 import re
 from datetime import datetime
 
@@ -192,13 +193,13 @@ def bookings():
 @ubp.route('/booking/<booking_id>')
 @login_required
 def booking_detail(booking_id):
-    booking = Booking.query.get(booking_id)
+    booking = Booking.query.options(selectinload(Booking.tracking_updates)).get(booking_id)
     
     if not booking or booking.user_id != current_user.id:
         flash('Booking not found', 'error')
         return redirect(url_for('users.bookings'))
     
-    updates = booking.tracking_updates.order_by(TrackingUpdate.timestamp.desc()).all()
+    updates = booking.tracking_updates
     
     return render_template('users/booking_detail.html',
                          booking=booking,
@@ -0,0 +1,47 @@
+# utils.py
+"""
+Shared helpers for Flask views
+"""
+
+import decimal
+
+import orjson
+from flask import current_app
+from flask.json.provider import JSONProvider
+
+# Naive datetimes are treated as UTC; non-str dict keys are stringified like json does
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Types orjson lacks that Flask's DefaultJSONProvider serializes"""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """app.json provider backed by orjson, so jsonify(), |tojson and the session cookie use it too"""
+
+    def dumps(self, obj, **kwargs):
+        option = ORJSON_OPTIONS
+        if kwargs.get('sort_keys'):
+            option |= orjson.OPT_SORT_KEYS
+        # orjson only indents by two spaces
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', _default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def orjsonify(obj, status=200):
+    """jsonify() replacement that writes orjson's bytes straight into the response"""
+    return current_app.response_class(
+        orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS),
+        status=status,
+        mimetype='application/json'
+    )